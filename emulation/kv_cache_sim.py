@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+kv_cache_sim.py
+
+V2: Trace-driven three-tier KV block cache simulator (HBM / HBF / SSD).
+
+Purpose:
+- kv_spill_sim.py assumes a fixed spill volume per token. In practice spill depends on the eviction
+  policy and on prefix reuse across requests (shared system prompts, multi-turn sessions).
+- This replays a trace of KV block accesses (one decode step reads every block of its context)
+  through an exclusive HBM -> HBF -> SSD hierarchy and reports, per policy:
+  hit rates per tier, bytes moved per tier, and the resulting decode ceiling.
+
+Hierarchy model:
+- A block is resident in exactly one tier. New blocks are produced in HBM (no tier traffic).
+- HBM hit: free. HBF / SSD hit: the block is read from that tier and, depending on --promotion,
+  moved up into HBM (always), only on its second lower-tier hit (on_second_hit), or never (bypass:
+  HBF serves in place, SSD hits are filled into HBF).
+- HBM victims are demoted to HBF; HBF victims are written back to SSD (SSD is unbounded).
+- Decode ceiling: HBF and SSD traffic per decode step fed through kv_spill_sim.ceiling_tg_tps
+  with each tier's bandwidth and per-op latency; the per-token times of the two tiers add.
+  Steps interleave concurrent sessions, so this is an aggregate tg ceiling across them.
+
+Eviction policies (same policy on HBM and HBF): lru, lfu, arc, prefix (prefix-tree aware: evicts LRU
+leaf blocks first so shared prefixes stay resident while their continuations are cached). Eviction and
+promotion are independent; --promotions sweeps several promotion modes per eviction policy. With
+promotion=always HBF only ever sees inserts and removals, so its eviction order is close to FIFO for
+every policy; the other modes let HBF hits count as touches.
+
+Block metadata lives in flat `array` columns indexed by a dense block id, so multi-million access
+traces replay without per-block Python objects.
+
+Trace file format (CSV, header required; parent optional, -1 = root):
+step,block,parent
+0,17,-1
+0,18,17
+
+Usage:
+python3 emulation/kv_cache_sim.py --hbm_mb 512 --hbf_mb 2048 --policies lru,lfu,arc,prefix
+python3 emulation/kv_cache_sim.py --trace my_trace.csv --hbf_mbps 4000 --ssd_mbps 1500
+"""
+import argparse
+import csv
+import heapq
+import random
+import time
+from array import array
+from typing import Dict, List, Tuple
+
+from kv_spill_sim import ceiling_tg_tps
+
+HBM, HBF, SSD = 1, 2, 3
+
+class Trace:
+    """Flat access trace: accesses[i] is a dense block id, step_ends[s] is the end offset of decode step s."""
+
+    def __init__(self):
+        self.accesses = array("l")
+        self.step_ends = array("l")
+        self.parent = array("l")
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self.parent)
+
+    @property
+    def n_steps(self) -> int:
+        return len(self.step_ends)
+
+    def new_block(self, parent: int = -1) -> int:
+        self.parent.append(parent)
+        return len(self.parent) - 1
+
+    def end_step(self) -> None:
+        self.step_ends.append(len(self.accesses))
+
+    def write_csv(self, path: str) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["step", "block", "parent"])
+            start = 0
+            for s, end in enumerate(self.step_ends):
+                for i in range(start, end):
+                    b = self.accesses[i]
+                    w.writerow([s, b, self.parent[b]])
+                start = end
+
+def load_trace(path: str) -> Trace:
+    """Load a step,block[,parent] CSV; block ids are remapped to a dense range."""
+    tr = Trace()
+    ids: Dict[str, int] = {}
+    parents: Dict[int, str] = {}
+    cur_step = None
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            step = row["step"]
+            if cur_step is not None and step != cur_step:
+                tr.end_step()
+            cur_step = step
+            key = row["block"].strip()
+            b = ids.get(key)
+            if b is None:
+                b = ids[key] = tr.new_block()
+                par = (row.get("parent") or "-1").strip()
+                if par not in ("", "-1"):
+                    parents[b] = par
+            tr.accesses.append(b)
+    if cur_step is not None:
+        tr.end_step()
+    for b, par in parents.items():
+        tr.parent[b] = ids.get(par, -1)
+    return tr
+
+def synth_trace(n_prompts: int, prompt_blocks: int, sessions: int, turns: int, user_blocks: int,
+                gen_tokens: int, block_tokens: int, concurrency: int, seed: int) -> Trace:
+    """
+    Synthetic multi-tenant decode trace.
+    - n_prompts shared system prompts (prompt_blocks each), picked with a Zipf-like skew.
+    - Each session runs `turns` turns: user_blocks of new prompt, then gen_tokens decode steps.
+    - `concurrency` sessions are active at once and advance round-robin, one decode step each.
+    - Every decode step reads the session's whole context; a new block starts every block_tokens.
+    """
+    rng = random.Random(seed)
+    tr = Trace()
+
+    prompts: List[List[int]] = []
+    for _ in range(n_prompts):
+        chain, par = [], -1
+        for _ in range(prompt_blocks):
+            par = tr.new_block(par)
+            chain.append(par)
+        prompts.append(chain)
+    weights = [1.0 / (i + 1) for i in range(n_prompts)]
+
+    def start_session():
+        ctx = list(rng.choices(prompts, weights)[0]) if prompts else []
+        return {"ctx": ctx, "turn": 0, "left": 0, "tok": 0}
+
+    def start_turn(s):
+        for _ in range(user_blocks):
+            s["ctx"].append(tr.new_block(s["ctx"][-1] if s["ctx"] else -1))
+        s["turn"] += 1
+        s["left"] = gen_tokens
+        s["tok"] = 0
+
+    pending = sessions
+    active = []
+    while pending or active:
+        while pending and len(active) < concurrency:
+            s = start_session()
+            start_turn(s)
+            active.append(s)
+            pending -= 1
+        still = []
+        for s in active:
+            if s["tok"] % block_tokens == 0:
+                s["ctx"].append(tr.new_block(s["ctx"][-1] if s["ctx"] else -1))
+            tr.accesses.extend(s["ctx"])
+            tr.end_step()
+            s["tok"] += 1
+            s["left"] -= 1
+            if s["left"] <= 0:
+                if s["turn"] >= turns:
+                    continue
+                start_turn(s)
+            still.append(s)
+        active = still
+    return tr
+
+class _Lists:
+    """Circular doubly linked lists over flat arrays; blocks 0..n-1, sentinels n..n+k-1."""
+
+    def __init__(self, n_blocks: int, n_lists: int):
+        size = n_blocks + n_lists
+        self.prev = array("l", range(size))
+        self.next = array("l", range(size))
+        self.where = array("b", [-1]) * n_blocks
+        self.size = [0] * n_lists
+        self.base = n_blocks
+
+    def push_mru(self, li: int, b: int) -> None:
+        s = self.base + li
+        tail = self.prev[s]
+        self.prev[b] = tail
+        self.next[b] = s
+        self.next[tail] = b
+        self.prev[s] = b
+        self.where[b] = li
+        self.size[li] += 1
+
+    def unlink(self, b: int) -> None:
+        p, n = self.prev[b], self.next[b]
+        self.next[p] = n
+        self.prev[n] = p
+        self.size[self.where[b]] -= 1
+        self.where[b] = -1
+
+    def lru(self, li: int) -> int:
+        s = self.base + li
+        x = self.next[s]
+        return -1 if x == s else x
+
+class LRUPolicy:
+    def __init__(self, n_blocks: int, capacity: int, parent: array, counts: array):
+        self.lists = _Lists(n_blocks, 1)
+
+    def __len__(self) -> int:
+        return self.lists.size[0]
+
+    def touch(self, b: int) -> None:
+        self.lists.unlink(b)
+        self.lists.push_mru(0, b)
+
+    def on_miss(self, b: int) -> None:
+        pass
+
+    def insert(self, b: int) -> None:
+        self.lists.push_mru(0, b)
+
+    def victim(self, incoming: int) -> int:
+        return self.lists.lru(0)
+
+    def remove(self, b: int) -> None:
+        self.lists.unlink(b)
+
+    evict = remove
+
+class LFUPolicy:
+    """
+    Least-frequently-used with LRU tie-break; heap with lazy invalidation. Frequencies are the
+    simulator's per-block access counts, shared by both tiers, so they survive promotion/demotion.
+    """
+
+    def __init__(self, n_blocks: int, capacity: int, parent: array, counts: array):
+        self.freq = counts
+        self.stamp = array("l", [0]) * n_blocks
+        self.resident = bytearray(n_blocks)
+        self.heap: List[Tuple[int, int, int]] = []
+        self.tick = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _push(self, b: int) -> None:
+        self.tick += 1
+        self.stamp[b] = self.tick
+        heapq.heappush(self.heap, (self.freq[b], self.tick, b))
+        if len(self.heap) > 4 * self.count + 64:
+            self.heap = [(self.freq[x], self.stamp[x], x) for (_, t, x) in self.heap
+                         if self.resident[x] and self.stamp[x] == t]
+            heapq.heapify(self.heap)
+
+    def touch(self, b: int) -> None:
+        self._push(b)
+
+    def on_miss(self, b: int) -> None:
+        pass
+
+    def insert(self, b: int) -> None:
+        self.resident[b] = 1
+        self.count += 1
+        self._push(b)
+
+    def victim(self, incoming: int) -> int:
+        heap = self.heap
+        while heap:
+            f, t, b = heap[0]
+            if self.resident[b] and self.stamp[b] == t:
+                return b
+            heapq.heappop(heap)
+        return -1
+
+    def remove(self, b: int) -> None:
+        self.resident[b] = 0
+        self.count -= 1
+
+    evict = remove
+
+class ARCPolicy:
+    """Adaptive Replacement Cache (Megiddo & Modha): T1/T2 resident, B1/B2 ghosts, adaptive target p."""
+    T1, T2, B1, B2 = 0, 1, 2, 3
+
+    def __init__(self, n_blocks: int, capacity: int, parent: array, counts: array):
+        self.lists = _Lists(n_blocks, 4)
+        self.c = capacity
+        self.p = 0.0
+
+    def __len__(self) -> int:
+        return self.lists.size[self.T1] + self.lists.size[self.T2]
+
+    def touch(self, b: int) -> None:
+        self.lists.unlink(b)
+        self.lists.push_mru(self.T2, b)
+
+    def on_miss(self, b: int) -> None:
+        # a ghost hit adapts p before REPLACE picks the victim (ARC cases II/III)
+        w = self.lists.where[b]
+        size = self.lists.size
+        if w == self.B1:
+            self.p = min(float(self.c), self.p + max(size[self.B2] / size[self.B1], 1.0))
+        elif w == self.B2:
+            self.p = max(0.0, self.p - max(size[self.B1] / size[self.B2], 1.0))
+
+    def insert(self, b: int) -> None:
+        L = self.lists
+        w = L.where[b]
+        size = L.size
+        if w == self.B1 or w == self.B2:
+            L.unlink(b)
+            L.push_mru(self.T2, b)
+        else:
+            L.push_mru(self.T1, b)
+        # bound the ghost directory: |T1|+|B1| <= c, total <= 2c
+        if size[self.T1] + size[self.B1] > self.c and size[self.B1]:
+            L.unlink(L.lru(self.B1))
+        if sum(size) > 2 * self.c and size[self.B2]:
+            L.unlink(L.lru(self.B2))
+
+    def victim(self, incoming: int) -> int:
+        L = self.lists
+        t1 = L.size[self.T1]
+        if t1 and (t1 > self.p or (L.where[incoming] == self.B2 and t1 >= self.p) or not L.size[self.T2]):
+            return L.lru(self.T1)
+        return L.lru(self.T2)
+
+    def evict(self, b: int) -> None:
+        # evicted blocks leave a ghost entry so a quick return adapts p
+        L = self.lists
+        ghost = self.B1 if L.where[b] == self.T1 else self.B2
+        L.unlink(b)
+        L.push_mru(ghost, b)
+
+    def remove(self, b: int) -> None:
+        # promoted out of this tier: not an eviction, no ghost
+        self.lists.unlink(b)
+
+class PrefixPolicy:
+    """
+    Prefix-tree aware LRU: a block with resident children in this tier is an interior node of the
+    cached prefix tree and is only evicted when no leaf is left. Shared system-prompt blocks therefore
+    stay resident as long as any continuation of them is cached.
+    """
+    LEAF, INNER = 0, 1
+
+    def __init__(self, n_blocks: int, capacity: int, parent: array, counts: array):
+        self.lists = _Lists(n_blocks, 2)
+        self.parent = parent
+        self.children = array("l", [0]) * n_blocks
+
+    def __len__(self) -> int:
+        return self.lists.size[self.LEAF] + self.lists.size[self.INNER]
+
+    def touch(self, b: int) -> None:
+        L = self.lists
+        li = L.where[b]
+        L.unlink(b)
+        L.push_mru(li, b)
+
+    def on_miss(self, b: int) -> None:
+        pass
+
+    def insert(self, b: int) -> None:
+        L = self.lists
+        L.push_mru(self.INNER if self.children[b] else self.LEAF, b)
+        p = self.parent[b]
+        if p >= 0:
+            self.children[p] += 1
+            if L.where[p] == self.LEAF:
+                L.unlink(p)
+                L.push_mru(self.INNER, p)
+
+    def victim(self, incoming: int) -> int:
+        b = self.lists.lru(self.LEAF)
+        return b if b >= 0 else self.lists.lru(self.INNER)
+
+    def remove(self, b: int) -> None:
+        L = self.lists
+        L.unlink(b)
+        p = self.parent[b]
+        if p >= 0:
+            self.children[p] -= 1
+            if self.children[p] == 0 and L.where[p] == self.INNER:
+                L.unlink(p)
+                L.push_mru(self.LEAF, p)
+
+    evict = remove
+
+POLICIES = {"lru": LRUPolicy, "lfu": LFUPolicy, "arc": ARCPolicy, "prefix": PrefixPolicy}
+
+PROMOTIONS = ["always", "on_second_hit", "bypass"]
+
+def simulate(tr: Trace, policy: str, hbm_blocks: int, hbf_blocks: int, promotion: str = "always") -> Dict[str, int]:
+    """
+    Replay tr through HBM/HBF/SSD; returns access and block-move counters.
+
+    promotion decides what a lower-tier hit does (eviction is the policy's job):
+    - always:        every HBF / SSD hit moves the block up into HBM
+    - on_second_hit: the first lower-tier hit since the block left HBM is served in place, the second promotes
+    - bypass:        lower-tier hits never fill HBM; HBF serves in place and SSD hits are filled into HBF
+    """
+    if hbm_blocks < 1 or hbf_blocks < 1:
+        raise ValueError("tier capacities must be at least one block")
+    if promotion not in PROMOTIONS:
+        raise ValueError(f"unknown promotion: {promotion}")
+    cls = POLICIES[policy]
+    n = tr.n_blocks
+    counts = array("l", [0]) * n
+    hbm = cls(n, hbm_blocks, tr.parent, counts)
+    hbf = cls(n, hbf_blocks, tr.parent, counts)
+    loc = bytearray(n)
+    lower_hits = bytearray(n)
+    hits = [0, 0, 0, 0]  # new, HBM, HBF, SSD
+    moves = {"hbf_writes": 0, "ssd_writes": 0}
+
+    def place_hbf(v: int) -> None:
+        hbf.on_miss(v)
+        if len(hbf) >= hbf_blocks:
+            w = hbf.victim(v)
+            hbf.evict(w)
+            loc[w] = SSD
+            moves["ssd_writes"] += 1
+        hbf.insert(v)
+        loc[v] = HBF
+        moves["hbf_writes"] += 1
+
+    def place_hbm(b: int) -> None:
+        hbm.on_miss(b)
+        if len(hbm) >= hbm_blocks:
+            v = hbm.victim(b)
+            hbm.evict(v)
+            lower_hits[v] = 0
+            place_hbf(v)
+        hbm.insert(b)
+        loc[b] = HBM
+
+    for b in tr.accesses:
+        l = loc[b]
+        hits[l] += 1
+        counts[b] += 1
+        if l == HBM:
+            hbm.touch(b)
+            continue
+        if l == 0:
+            place_hbm(b)
+            continue
+        if promotion == "bypass" or (promotion == "on_second_hit" and not lower_hits[b]):
+            lower_hits[b] = 1
+            if l == HBF:
+                hbf.touch(b)
+            elif promotion == "bypass":
+                place_hbf(b)
+            continue
+        if l == HBF:
+            hbf.remove(b)
+        place_hbm(b)
+
+    return {
+        "accesses": len(tr.accesses),
+        "new": hits[0],
+        "hbm_hits": hits[HBM],
+        "hbf_hits": hits[HBF],
+        "ssd_hits": hits[SSD],
+        "hbf_reads": hits[HBF],
+        "hbf_writes": moves["hbf_writes"],
+        "ssd_reads": hits[SSD],
+        "ssd_writes": moves["ssd_writes"],
+    }
+
+def decode_ceiling(res: Dict[str, int], steps: int, block_kb: float, hbf_mbps: float, hbf_lat_ms: float,
+                   ssd_mbps: float, ssd_lat_ms: float) -> float:
+    """Per-step HBF and SSD traffic (reads + writes) -> tg ceiling; the two tiers' per-token times add."""
+    if steps <= 0:
+        return float("inf")
+    per_token_s = 0.0
+    for ops, mbps, lat_ms in ((res["hbf_reads"] + res["hbf_writes"], hbf_mbps, hbf_lat_ms),
+                              (res["ssd_reads"] + res["ssd_writes"], ssd_mbps, ssd_lat_ms)):
+        ops_per_token = ops / steps
+        if ops_per_token <= 0:
+            continue
+        per_token_s += 1.0 / ceiling_tg_tps(ops_per_token * block_kb, mbps, lat_ms, ops_per_token)
+    return float("inf") if per_token_s <= 0 else 1.0 / per_token_s
+
+def main():
+    ap = argparse.ArgumentParser(description="Trace-driven HBM/HBF/SSD KV block cache simulator.")
+    ap.add_argument("--trace", default=None, help="CSV trace (step,block[,parent]); synthetic if unset.")
+    ap.add_argument("--dump_trace", default=None, help="Write the (synthetic) trace to this CSV.")
+    ap.add_argument("--policies", default="lru,lfu,arc,prefix")
+    ap.add_argument("--promotions", default="always", help=f"Comma-separated promotion modes: {','.join(PROMOTIONS)}.")
+    ap.add_argument("--kv_kb_per_token", type=float, default=256.0)
+    ap.add_argument("--block_tokens", type=int, default=16)
+    ap.add_argument("--hbm_mb", type=float, default=512.0)
+    ap.add_argument("--hbf_mb", type=float, default=2048.0)
+    ap.add_argument("--hbf_mbps", type=float, default=4000.0)
+    ap.add_argument("--hbf_lat_ms", type=float, default=0.05)
+    ap.add_argument("--ssd_mbps", type=float, default=1500.0)
+    ap.add_argument("--ssd_lat_ms", type=float, default=0.1)
+    ap.add_argument("--csv_out", default=None)
+    # synthetic workload
+    ap.add_argument("--system_prompts", type=int, default=8)
+    ap.add_argument("--prompt_blocks", type=int, default=32)
+    ap.add_argument("--sessions", type=int, default=64)
+    ap.add_argument("--turns", type=int, default=3)
+    ap.add_argument("--user_blocks", type=int, default=4)
+    ap.add_argument("--gen_tokens", type=int, default=64)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    policies = [x.strip() for x in args.policies.split(",") if x.strip()]
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown:
+        raise SystemExit(f"unknown policies: {unknown} (choose from {sorted(POLICIES)})")
+    promotions = [x.strip() for x in args.promotions.split(",") if x.strip()]
+    unknown = [p for p in promotions if p not in PROMOTIONS]
+    if unknown:
+        raise SystemExit(f"unknown promotions: {unknown} (choose from {PROMOTIONS})")
+
+    block_kb = args.kv_kb_per_token * args.block_tokens
+    hbm_blocks = int(args.hbm_mb * 1000.0 / block_kb)
+    hbf_blocks = int(args.hbf_mb * 1000.0 / block_kb)
+    if hbm_blocks < 1 or hbf_blocks < 1:
+        raise SystemExit(f"--hbm_mb/--hbf_mb must hold at least one {block_kb:g} KB block")
+
+    t0 = time.time()
+    if args.trace:
+        tr = load_trace(args.trace)
+    else:
+        tr = synth_trace(args.system_prompts, args.prompt_blocks, args.sessions, args.turns, args.user_blocks,
+                         args.gen_tokens, args.block_tokens, args.concurrency, args.seed)
+    trace_s = time.time() - t0
+    if args.dump_trace:
+        tr.write_csv(args.dump_trace)
+
+    print("trace=", args.trace or "synthetic")
+    print("accesses=", len(tr.accesses), "blocks=", tr.n_blocks, "decode_steps=", tr.n_steps,
+          f"trace_s={trace_s:.2f}")
+    print("block_kb=", block_kb, "hbm_blocks=", hbm_blocks, "hbf_blocks=", hbf_blocks)
+    print("hbf_mbps=", args.hbf_mbps, "hbf_lat_ms=", args.hbf_lat_ms,
+          "ssd_mbps=", args.ssd_mbps, "ssd_lat_ms=", args.ssd_lat_ms)
+    print("")
+
+    fieldnames = ["policy", "promotion", "hbm_hit", "hbf_hit", "ssd_hit", "new",
+                  "hbf_read_MB", "hbf_write_MB", "ssd_read_MB", "ssd_write_MB",
+                  "tg_tps_max", "sim_s"]
+    rows = []
+    print(",".join(fieldnames))
+    for pol in policies:
+        for promo in promotions:
+            s0 = time.time()
+            res = simulate(tr, pol, hbm_blocks, hbf_blocks, promo)
+            sim_s = time.time() - s0
+            acc = max(res["accesses"], 1)
+            mb = block_kb / 1000.0
+            row = {
+                "policy": pol,
+                "promotion": promo,
+                "hbm_hit": f"{res['hbm_hits'] / acc:.4f}",
+                "hbf_hit": f"{res['hbf_hits'] / acc:.4f}",
+                "ssd_hit": f"{res['ssd_hits'] / acc:.4f}",
+                "new": f"{res['new'] / acc:.4f}",
+                "hbf_read_MB": f"{res['hbf_reads'] * mb:.1f}",
+                "hbf_write_MB": f"{res['hbf_writes'] * mb:.1f}",
+                "ssd_read_MB": f"{res['ssd_reads'] * mb:.1f}",
+                "ssd_write_MB": f"{res['ssd_writes'] * mb:.1f}",
+                "tg_tps_max": f"{decode_ceiling(res, tr.n_steps, block_kb, args.hbf_mbps, args.hbf_lat_ms, args.ssd_mbps, args.ssd_lat_ms):.3f}",
+                "sim_s": f"{sim_s:.2f}",
+            }
+            rows.append(row)
+            print(",".join(row[k] for k in fieldnames))
+
+    if args.csv_out:
+        with open(args.csv_out, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=fieldnames)
+            w.writeheader()
+            w.writerows(rows)
+        print(f"\nWrote CSV: {args.csv_out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,149 @@
 #!/usr/bin/env python3
-import argparse, time, os
+"""
+tier_copy.py
+
+Throttled "tier" copy: moves a file through an emulated tier with a bandwidth cap (MB/s)
+and an extra per-chunk latency (ms).
+
+Compressed mode (--codec):
+- The source is pre-compressed per chunk into a "tier image" (not timed; reused across runs while its
+  header still matches the source file, codec, level and chunk size).
+- The compressed bytes move through the throttled tier; the cap applies to compressed bytes.
+- A process pool decompresses chunks concurrently while the next chunks are in flight.
+- Reports compression ratio, effective *uncompressed* MB/s and CPU-seconds, so a slow tier + CPU
+  decompression can be compared against a raw copy at the same cap. decompress_cpu_s counts only the
+  decompress calls; total_cpu_s adds everything else the mode costs (IPC pickling, parent reads/writes).
+
+Codecs: zlib and lzma (stdlib); lz4 and zstd when the `lz4` / `zstandard` packages are installed.
+
+Usage:
+python3 emulation/tier_copy.py --src model.gguf --dst staged.gguf --mbps 500 --chunk_mb 4 --lat_ms 0.05
+python3 emulation/tier_copy.py --src model.gguf --dst staged.gguf --mbps 500 --codec zstd --workers 4
+"""
+import argparse, json, time, os, resource, struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional, Tuple
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--src", required=True)
-    ap.add_argument("--dst", required=True)
-    ap.add_argument("--mbps", type=float, required=True, help="Throttle rate in MB/s (decimal MB).")
-    ap.add_argument("--chunk_mb", type=float, default=4.0, help="Chunk size in MB.")
-    ap.add_argument("--lat_ms", type=float, default=0.0, help="Extra sleep per chunk (ms).")
-    args = ap.parse_args()
+try:
+    import lz4.frame as _lz4
+except ImportError:
+    _lz4 = None
 
-    src = Path(args.src).expanduser()
-    dst = Path(args.dst).expanduser()
-    dst.parent.mkdir(parents=True, exist_ok=True)
+try:
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
 
-    chunk = int(args.chunk_mb * 1024 * 1024)
-    target_bps = args.mbps * 1_000_000.0
-    lat_s = args.lat_ms / 1000.0
+CODECS = ["none", "zlib", "lzma", "lz4", "zstd"]
+
+# Tier image layout: MAGIC, HEADER_LEN + JSON header (what the image was built from), then per-chunk
+# frames of FRAME (compressed length, uncompressed length) + payload.
+MAGIC = b"HBFTIER1"
+HEADER_LEN = struct.Struct(">I")
+FRAME = struct.Struct(">II")
 
+def image_header(src: Path, codec: str, level: Optional[int], chunk: int) -> dict:
+    st = src.stat()
+    return {"codec": codec, "level": level, "chunk_bytes": chunk,
+            "src_size": st.st_size, "src_mtime_ns": st.st_mtime_ns}
+
+def read_image_header(ftier) -> Optional[dict]:
+    """Header of an open tier image (positioned at the first frame afterwards); None if not a tier image."""
+    if ftier.read(len(MAGIC)) != MAGIC:
+        return None
+    raw = ftier.read(HEADER_LEN.size)
+    if len(raw) != HEADER_LEN.size:
+        return None
+    try:
+        return json.loads(ftier.read(HEADER_LEN.unpack(raw)[0]).decode("utf-8"))
+    except ValueError:
+        return None
+
+def image_matches(tier: Path, header: dict) -> bool:
+    if not tier.exists():
+        return False
+    with tier.open("rb") as ftier:
+        return read_image_header(ftier) == header
+
+def codec_available(codec: str) -> bool:
+    if codec == "lz4":
+        return _lz4 is not None
+    if codec == "zstd":
+        return _zstd is not None
+    return codec in CODECS
+
+def compress_chunk(codec: str, level: Optional[int], buf: bytes) -> bytes:
+    if codec == "zlib":
+        import zlib
+        return zlib.compress(buf, 6 if level is None else level)
+    if codec == "lzma":
+        import lzma
+        return lzma.compress(buf, preset=6 if level is None else level)
+    if codec == "lz4":
+        return _lz4.compress(buf, compression_level=0 if level is None else level)
+    if codec == "zstd":
+        return _zstd.ZstdCompressor(level=3 if level is None else level).compress(buf)
+    raise ValueError(f"unknown codec: {codec}")
+
+def decompress_chunk(codec: str, payload: bytes) -> Tuple[bytes, float]:
+    """Runs in a pool worker. Returns (data, cpu_seconds spent decompressing)."""
+    c0 = time.process_time()
+    if codec == "zlib":
+        import zlib
+        data = zlib.decompress(payload)
+    elif codec == "lzma":
+        import lzma
+        data = lzma.decompress(payload)
+    elif codec == "lz4":
+        data = _lz4.decompress(payload)
+    elif codec == "zstd":
+        data = _zstd.ZstdDecompressor().decompress(payload)
+    else:
+        raise ValueError(f"unknown codec: {codec}")
+    return data, time.process_time() - c0
+
+def _warmup(_: int) -> None:
+    time.sleep(0.05)
+
+def _compress_task(args: Tuple[str, Optional[int], bytes]) -> Tuple[int, bytes]:
+    codec, level, buf = args
+    return len(buf), compress_chunk(codec, level, buf)
+
+def build_tier_image(src: Path, tier: Path, header: dict, workers: int) -> float:
+    """Pre-compress src per chunk into tier (MAGIC + header, then FRAME + payload per chunk). Returns seconds spent."""
+    codec, level, chunk = header["codec"], header["level"], header["chunk_bytes"]
+    start = time.time()
+    tmp = tier.with_name(tier.name + ".tmp")
+    meta = json.dumps(header, sort_keys=True).encode("utf-8")
+    # bound in-flight chunks so memory stays ~ 2 * workers * chunk (pool.map would read all of src up front)
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool, src.open("rb") as fsrc, tmp.open("wb") as ftier:
+        ftier.write(MAGIC)
+        ftier.write(HEADER_LEN.pack(len(meta)))
+        ftier.write(meta)
+        pending = deque()
+
+        def write_one():
+            rlen, payload = pending.popleft().result()
+            ftier.write(FRAME.pack(len(payload), rlen))
+            ftier.write(payload)
+
+        while True:
+            buf = fsrc.read(chunk)
+            if not buf:
+                break
+            pending.append(pool.submit(_compress_task, (codec, level, buf)))
+            del buf
+            while len(pending) >= window:
+                write_one()
+        while pending:
+            write_one()
+    tmp.replace(tier)
+    return time.time() - start
+
+def copy_raw(src: Path, dst: Path, chunk: int, target_bps: float, lat_s: float) -> None:
     start = time.time()
     total = 0
 
@@ -47,5 +172,122 @@ def main():
     print(f"size_GB={gb:.3f}")
     print(f"effective_MBps={eff:.2f}")
 
+def copy_compressed(src: Path, dst: Path, tier: Path, codec: str, level: Optional[int], chunk: int,
+                    target_bps: float, lat_s: float, workers: int) -> None:
+    compress_s = 0.0
+    header = image_header(src, codec, level, chunk)
+    # rebuild unless the image was made from this exact src with this codec, level and chunk size
+    if not image_matches(tier, header):
+        compress_s = build_tier_image(src, tier, header, workers)
+
+    total = 0
+    moved = 0
+    cpu_s = 0.0
+    # bound in-flight chunks so memory stays ~ 2 * workers * chunk
+    window = 2 * workers
+    # children rusage only covers reaped processes, so it is read after the pool shuts down
+    children0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, tier.open("rb") as ftier, dst.open("wb") as fdst:
+        # spawn every worker before the clock starts: process startup is not tier time
+        list(pool.map(_warmup, range(workers)))
+        read_image_header(ftier)  # skip to the first frame
+        start = time.time()
+        parent0 = os.times()
+        pending = deque()
+
+        def drain_one():
+            nonlocal cpu_s
+            data, c = pending.popleft().result()
+            fdst.write(data)
+            cpu_s += c
+
+        while True:
+            t0 = time.time()
+            hdr = ftier.read(FRAME.size)
+            if not hdr:
+                break
+            clen, rlen = FRAME.unpack(hdr)
+            payload = ftier.read(clen)
+            pending.append(pool.submit(decompress_chunk, codec, payload))
+            moved += clen
+            total += rlen
+
+            # throttle on compressed bytes: that is what crosses the tier
+            need = clen / target_bps
+            spent = time.time() - t0
+            sleep_s = max(0.0, need - spent) + lat_s
+            if sleep_s > 0:
+                time.sleep(sleep_s)
+
+            while len(pending) >= window:
+                drain_one()
+
+        while pending:
+            drain_one()
+        dur = time.time() - start
+
+    parent1 = os.times()
+    children1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # parent (read, submit, unpickle, write) + workers (decompress, pickle results back; includes their startup)
+    total_cpu_s = ((parent1.user - parent0.user) + (parent1.system - parent0.system)
+                   + (children1.ru_utime - children0.ru_utime) + (children1.ru_stime - children0.ru_stime))
+    ratio = total / moved if moved else 0.0
+
+    print(f"codec={codec}")
+    print(f"copied_bytes={total}")
+    print(f"compressed_bytes={moved}")
+    print(f"compression_ratio={ratio:.4f}")
+    print(f"duration_s={dur:.3f}")
+    print(f"size_GB={total / 1e9:.3f}")
+    print(f"tier_MBps={(moved / 1e6) / dur:.2f}")
+    print(f"effective_MBps={(total / 1e6) / dur:.2f}")
+    print(f"effective_uncompressed_MBps={(total / 1e6) / dur:.2f}")
+    print(f"decompress_cpu_s={cpu_s:.3f}")
+    print(f"total_cpu_s={total_cpu_s:.3f}")
+    print(f"decompress_workers={workers}")
+    print(f"compress_s={compress_s:.3f}")
+    print(f"tier_image={tier}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", required=True)
+    ap.add_argument("--dst", required=True)
+    ap.add_argument("--mbps", type=float, required=True, help="Throttle rate in MB/s (decimal MB).")
+    ap.add_argument("--chunk_mb", type=float, default=4.0, help="Chunk size in MB.")
+    ap.add_argument("--lat_ms", type=float, default=0.0, help="Extra sleep per chunk (ms).")
+    ap.add_argument("--codec", choices=CODECS, default="none",
+                    help="Compress per chunk before the tier and decompress in a process pool after it.")
+    ap.add_argument("--level", type=int, default=None, help="Codec compression level (codec default if unset).")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decompression worker processes.")
+    ap.add_argument("--tier_image", default=None,
+                    help="Pre-compressed tier image path (default: next to --dst; reused only if built from the same --src, codec, level and chunk size).")
+    args = ap.parse_args()
+
+    src = Path(args.src).expanduser()
+    dst = Path(args.dst).expanduser()
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    chunk = int(args.chunk_mb * 1024 * 1024)
+    target_bps = args.mbps * 1_000_000.0
+    lat_s = args.lat_ms / 1000.0
+
+    if args.codec == "none":
+        copy_raw(src, dst, chunk, target_bps, lat_s)
+        return
+
+    if not codec_available(args.codec):
+        pkg = {"lz4": "lz4", "zstd": "zstandard"}[args.codec]
+        raise SystemExit(f"codec {args.codec} needs the '{pkg}' package (pip install {pkg})")
+    if args.workers < 1:
+        raise SystemExit("--workers must be >= 1")
+
+    level_tag = "" if args.level is None else str(args.level)
+    if args.tier_image:
+        tier = Path(args.tier_image).expanduser()
+    else:
+        tier = dst.parent / f"{src.name}.{args.codec}{level_tag}_chunk{args.chunk_mb:g}.tier"
+    copy_compressed(src, dst, tier, args.codec, args.level, chunk, target_bps, lat_s, args.workers)
+
 if __name__ == "__main__":
     main()
@@ -7,6 +7,8 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from system_info import add_quiescence_args, fingerprint, quiesce_from_args
+
 def run(cmd: List[str]) -> str:
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
     if p.returncode != 0:
@@ -59,6 +61,7 @@ def main():
     ap.add_argument("--mode", default="warm")
     ap.add_argument("--tag", default="")
     ap.add_argument("--out", required=True)
+    add_quiescence_args(ap)
     args = ap.parse_args()
 
     bench = Path(args.llama_bench).expanduser()
@@ -79,6 +82,8 @@ def main():
         "-n", str(args.gen_tokens),
     ]
 
+    quiescence = quiesce_from_args(args)
+    host = fingerprint()
     start = time.time()
     out = run(cmd)
     wall_ms = (time.time() - start) * 1000.0
@@ -99,6 +104,9 @@ def main():
         "pp_tps": tps["pp_tps"],
         "tg_tps": tps["tg_tps"],
         "rows": rows,
+        "host_settled": None if quiescence is None else quiescence["settled"],
+        "quiescence": quiescence,
+        "fingerprint": host,
         "output_tail": "\n".join(out.strip().splitlines()[-80:]),
     }
 
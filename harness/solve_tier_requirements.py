@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+solve_tier_requirements.py
+
+Turn weight-tier sweep CSVs into a tier requirement: the minimum bandwidth (per latency) that keeps
+staging time and decode throughput within SLO targets, with bootstrap confidence bounds, plus the
+unmeasured grid points that would most reduce that uncertainty.
+
+Models (linear in their coefficients, fit by least squares):
+- stage_seconds = b0 + b1 * s_per_GB + b2 * lat_ms_per_MB
+    s_per_GB      = 1000 / tier_mbps           (transfer term; b1 ~ model size in GB)
+    lat_ms_per_MB = tier_lat_ms / tier_chunk_mb (per-chunk latency term; chunks ~ size / chunk_mb)
+  Staging is fit against the tier's bandwidth cap, not stage_effective_mbps: the latter is size / stage_seconds,
+  so fitting on it is circular. The implied effective MB/s at each requirement is reported instead.
+  The sweep stages once per grid point and copies stage_seconds into every repeat row, so the stage model
+  uses one row per staging event (deduplicated on csv, tier_mbps, tier_lat_ms, tier_chunk_mb, codec, level).
+- tg_mean = c0 + c1 * s_per_GB + c2 * tier_lat_ms [+ c3 * residency], on every row (each repeat is a bench run).
+    The residency term is reserved for a future --residency_col column (e.g. fraction of weights/KV resident
+    in HBM). No harness script writes one yet, so today tg is fit without it.
+
+Only one staging codec is fit at a time (--codec, default none; CSVs without tier_codec count as none):
+compressed and raw staging at the same tier_mbps have very different staging times.
+
+Uncertainty: rows are resampled with replacement (--bootstrap times) and both models are refit; each
+replicate is inverted against the SLOs, and requirements are reported as median and --ci bounds.
+
+Next points: every candidate (mbps, lat) grid point not yet measured is scored by how much the replicates
+disagree on whether it meets the SLOs (p * (1 - p)); points on the uncertain boundary come first.
+
+Rows flagged host_settled=False by the quiescence gate are dropped unless --keep_unsettled.
+
+Usage:
+./harness/solve_tier_requirements.py --csv results/hbf_weight_tier_v2.csv --stage_slo_s 15 --tg_slo_tps 8
+"""
+import argparse
+import csv
+import json
+import math
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sweep_llama_bench import extract_mean_std
+
+def parse_float(v: Optional[str]) -> Optional[float]:
+    try:
+        return float(v) if v not in (None, "") else None
+    except ValueError:
+        return None
+
+def load_rows(paths: Sequence[Path], residency_col: str, keep_unsettled: bool, codec: str,
+              codec_level: Optional[str]) -> Tuple[List[Dict[str, Any]], int]:
+    """Ingest sweep CSV rows staged with `codec` into numeric rows; returns (rows, dropped_unsettled)."""
+    rows: List[Dict[str, Any]] = []
+    dropped = 0
+    for path in paths:
+        with path.open(newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                row_codec = r.get("tier_codec") or "none"
+                row_level = r.get("tier_codec_level") or ""
+                if row_codec != codec or (codec_level is not None and row_level != codec_level):
+                    continue
+                if not keep_unsettled and r.get("host_settled") == "False":
+                    dropped += 1
+                    continue
+                mbps = parse_float(r.get("tier_mbps"))
+                lat = parse_float(r.get("tier_lat_ms"))
+                chunk = parse_float(r.get("tier_chunk_mb"))
+                if not mbps or lat is None or not chunk:
+                    continue
+                tg_mean, _ = extract_mean_std(r.get("tg_tps"))
+                stage = parse_float(r.get("stage_seconds"))
+                eff = parse_float(r.get("stage_effective_mbps"))
+                rows.append({
+                    "mbps": mbps,
+                    "lat_ms": lat,
+                    "chunk_mb": chunk,
+                    "stage_s": stage,
+                    "size_mb": stage * eff if stage and eff else None,
+                    "tg": tg_mean,
+                    "residency": parse_float(r.get(residency_col)),
+                    "codec_level": row_level,
+                    "stage_key": (str(path), mbps, lat, chunk, row_codec, row_level),
+                })
+    return rows, dropped
+
+def stage_features(mbps: float, lat_ms: float, chunk_mb: float) -> List[float]:
+    return [1.0, 1000.0 / mbps, lat_ms / chunk_mb]
+
+def tg_features(mbps: float, lat_ms: float, residency: Optional[float]) -> List[float]:
+    x = [1.0, 1000.0 / mbps, lat_ms]
+    if residency is not None:
+        x.append(residency)
+    return x
+
+def lstsq(X: List[List[float]], y: List[float], ridge: float = 1e-9) -> Optional[List[float]]:
+    """Least squares via normal equations + Gaussian elimination; None if singular."""
+    k = len(X[0])
+    A = [[sum(r[i] * r[j] for r in X) + (ridge if i == j else 0.0) for j in range(k)] for i in range(k)]
+    b = [sum(r[i] * yi for r, yi in zip(X, y)) for i in range(k)]
+    for c in range(k):
+        piv = max(range(c, k), key=lambda i: abs(A[i][c]))
+        if abs(A[piv][c]) < 1e-12:
+            return None
+        A[c], A[piv] = A[piv], A[c]
+        b[c], b[piv] = b[piv], b[c]
+        for i in range(c + 1, k):
+            f = A[i][c] / A[c][c]
+            for j in range(c, k):
+                A[i][j] -= f * A[c][j]
+            b[i] -= f * b[c]
+    coef = [0.0] * k
+    for i in reversed(range(k)):
+        coef[i] = (b[i] - sum(A[i][j] * coef[j] for j in range(i + 1, k))) / A[i][i]
+    return coef
+
+def dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+def min_mbps(a: float, r: float) -> float:
+    """Smallest tier_mbps with a * s_per_GB <= r (s_per_GB = 1000 / mbps > 0). 0 = any, inf = none."""
+    if a > 0:
+        return 1000.0 * a / r if r > 0 else math.inf
+    if a < 0 or r >= 0:
+        return 0.0
+    return math.inf
+
+def percentile(vals: Sequence[float], q: float) -> float:
+    s = sorted(vals)
+    if not s:
+        return math.nan
+    pos = q * (len(s) - 1)
+    lo, hi = int(math.floor(pos)), int(math.ceil(pos))
+    if s[lo] == s[hi] or math.isinf(s[hi]):
+        return s[hi] if pos > lo else s[lo]
+    return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+class Fits:
+    """Point fit plus bootstrap replicates of the stage and tg models."""
+
+    def __init__(self, rows: List[Dict[str, float]], n_boot: int, seed: int, use_residency: bool):
+        # one observation per staging event: repeat rows share the same stage_seconds
+        seen = set()
+        self.stage_rows = []
+        for r in rows:
+            if r["stage_s"] is not None and r["stage_key"] not in seen:
+                seen.add(r["stage_key"])
+                self.stage_rows.append(r)
+        self.tg_rows = [r for r in rows if r["tg"] is not None and (not use_residency or r["residency"] is not None)]
+        self.use_residency = use_residency
+        self.stage = self._fit_stage(self.stage_rows)
+        self.tg = self._fit_tg(self.tg_rows)
+        rng = random.Random(seed)
+        self.boot: List[Tuple[Optional[List[float]], Optional[List[float]]]] = []
+        for _ in range(n_boot):
+            s = [rng.choice(self.stage_rows) for _ in self.stage_rows] if self.stage_rows else []
+            t = [rng.choice(self.tg_rows) for _ in self.tg_rows] if self.tg_rows else []
+            self.boot.append((self._fit_stage(s), self._fit_tg(t)))
+
+    def _fit_stage(self, rows):
+        if len(rows) < 3:
+            return None
+        return lstsq([stage_features(r["mbps"], r["lat_ms"], r["chunk_mb"]) for r in rows], [r["stage_s"] for r in rows])
+
+    def _fit_tg(self, rows):
+        if len(rows) < 3:
+            return None
+        res = (lambda r: r["residency"]) if self.use_residency else (lambda r: None)
+        return lstsq([tg_features(r["mbps"], r["lat_ms"], res(r)) for r in rows], [r["tg"] for r in rows])
+
+def requirement(stage_coef, tg_coef, lat_ms: float, chunk_mb: float, residency: Optional[float],
+                stage_slo: Optional[float], tg_slo: Optional[float]) -> float:
+    """Minimum tier_mbps meeting every given SLO at this latency for one set of coefficients."""
+    need = 0.0
+    if stage_slo is not None:
+        if stage_coef is None:
+            return math.nan
+        b0, b1, b2 = stage_coef
+        need = max(need, min_mbps(b1, stage_slo - b0 - b2 * lat_ms / chunk_mb))
+    if tg_slo is not None:
+        if tg_coef is None:
+            return math.nan
+        rest = tg_coef[0] + tg_coef[2] * lat_ms + (tg_coef[3] * residency if len(tg_coef) > 3 else 0.0)
+        need = max(need, min_mbps(-tg_coef[1], rest - tg_slo))
+    return need
+
+def meets(stage_coef, tg_coef, mbps: float, lat_ms: float, chunk_mb: float, residency: Optional[float],
+          stage_slo: Optional[float], tg_slo: Optional[float]) -> Optional[bool]:
+    ok = True
+    if stage_slo is not None:
+        if stage_coef is None:
+            return None
+        ok = ok and dot(stage_coef, stage_features(mbps, lat_ms, chunk_mb)) <= stage_slo
+    if tg_slo is not None:
+        if tg_coef is None:
+            return None
+        ok = ok and dot(tg_coef, tg_features(mbps, lat_ms, residency if len(tg_coef) > 3 else None)) >= tg_slo
+    return ok
+
+def densify(vals: Sequence[float], geometric: bool) -> List[float]:
+    """Measured values plus midpoints between neighbours and one step beyond each end."""
+    v = sorted(set(vals))
+    out = set(v)
+    for a, b in zip(v, v[1:]):
+        out.add(math.sqrt(a * b) if geometric and a > 0 else (a + b) / 2.0)
+    if len(v) >= 2:
+        if geometric and v[0] > 0:
+            out.add(v[0] * v[0] / v[1])
+            out.add(v[-1] * v[-1] / v[-2])
+        else:
+            out.add(max(0.0, v[0] - (v[1] - v[0])))
+            out.add(v[-1] + (v[-1] - v[-2]))
+    return sorted(round(x, 3) for x in out)
+
+def fmt(v: float) -> str:
+    if math.isnan(v):
+        return "n/a"
+    if math.isinf(v):
+        return "infeasible"
+    return f"{v:.0f}"
+
+def status(v: float) -> str:
+    """JSON companion of fmt(): why a number is missing."""
+    if math.isnan(v):
+        return "n/a"
+    if math.isinf(v):
+        return "infeasible"
+    return "ok"
+
+def finite(v: Optional[float]) -> Optional[float]:
+    """Non-finite values become null so --json_out stays strict JSON."""
+    return v if v is not None and math.isfinite(v) else None
+
+def main():
+    ap = argparse.ArgumentParser(description="Fit sweep results and solve for minimum tier specs under SLO targets.")
+    ap.add_argument("--csv", action="append", required=True, help="Weight-tier sweep CSV (repeat for several).")
+    ap.add_argument("--stage_slo_s", type=float, default=None, help="Max staging seconds.")
+    ap.add_argument("--tg_slo_tps", type=float, default=None, help="Min decode tokens/s.")
+    ap.add_argument("--lat_ms_list", default=None, help="Latencies to solve at (default: measured values).")
+    ap.add_argument("--chunk_mb", type=float, default=None, help="Chunk size to solve at (default: median measured).")
+    ap.add_argument("--codec", default="none", help="Only fit rows staged with this tier_codec.")
+    ap.add_argument("--codec_level", default=None, help="Only fit rows with this tier_codec_level.")
+    ap.add_argument("--residency_col", default="residency",
+                    help="Optional residency column for the tg model (no harness script writes one yet).")
+    ap.add_argument("--residency", type=float, default=None, help="Residency to solve at (default: median measured).")
+    ap.add_argument("--bootstrap", type=int, default=1000)
+    ap.add_argument("--ci", type=float, default=0.90, help="Two-sided confidence level for bounds.")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--cand_mbps_list", default=None, help="Candidate mbps grid for next points (default: densified measured).")
+    ap.add_argument("--cand_lat_ms_list", default=None, help="Candidate latency grid for next points (default: densified measured).")
+    ap.add_argument("--suggest", type=int, default=5, help="How many next grid points to suggest.")
+    ap.add_argument("--keep_unsettled", action="store_true", help="Keep rows flagged host_settled=False.")
+    ap.add_argument("--json_out", default=None)
+    args = ap.parse_args()
+
+    if args.stage_slo_s is None and args.tg_slo_tps is None:
+        raise SystemExit("Provide --stage_slo_s and/or --tg_slo_tps")
+
+    paths = [Path(p).expanduser() for p in args.csv]
+    for p in paths:
+        if not p.exists():
+            raise SystemExit(f"CSV not found: {p}")
+    rows, dropped = load_rows(paths, args.residency_col, args.keep_unsettled, args.codec, args.codec_level)
+    if len(rows) < 3:
+        raise SystemExit(f"need at least 3 usable rows with tier_codec={args.codec}, got {len(rows)}")
+    levels = sorted({r["codec_level"] for r in rows})
+    if len(levels) > 1:
+        raise SystemExit(f"rows mix codec levels {levels}; pick one with --codec_level")
+
+    res_vals = [r["residency"] for r in rows if r["residency"] is not None]
+    use_residency = len(res_vals) == len(rows) and len(set(res_vals)) > 1
+    residency = args.residency if args.residency is not None else (percentile(res_vals, 0.5) if use_residency else None)
+    chunk_mb = args.chunk_mb if args.chunk_mb is not None else percentile([r["chunk_mb"] for r in rows], 0.5)
+    if args.lat_ms_list:
+        lat_vals = [float(x.strip()) for x in args.lat_ms_list.split(",") if x.strip()]
+    else:
+        lat_vals = sorted({r["lat_ms"] for r in rows})
+    sizes = [r["size_mb"] for r in rows if r["size_mb"]]
+    size_mb = percentile(sizes, 0.5) if sizes else None
+    measured_mbps = sorted({r["mbps"] for r in rows})
+
+    fits = Fits(rows, args.bootstrap, args.seed, use_residency)
+    lo_q, hi_q = (1.0 - args.ci) / 2.0, 1.0 - (1.0 - args.ci) / 2.0
+
+    print("codec=", args.codec, "codec_level=", levels[0] or None)
+    print("tg_rows=", len(fits.tg_rows), "stage_events=", len(fits.stage_rows), "dropped_unsettled=", dropped,
+          "bootstrap=", args.bootstrap, "ci=", args.ci)
+    if not use_residency:
+        print(f"residency: no varying '{args.residency_col}' column in the CSVs; tg fit without it")
+    print("stage_slo_s=", args.stage_slo_s, "tg_slo_tps=", args.tg_slo_tps, "chunk_mb=", chunk_mb,
+          "residency=", residency)
+    print("")
+
+    coef_report: Dict[str, Any] = {}
+    for name, idx, labels in (("stage", 0, ["b0", "b1_s_per_GB", "b2_lat_ms_per_MB"]),
+                              ("tg", 1, ["c0", "c1_s_per_GB", "c2_lat_ms", "c3_residency"])):
+        point = fits.stage if idx == 0 else fits.tg
+        if point is None:
+            print(f"{name}: not enough rows to fit")
+            continue
+        print(f"{name} model: coef,point,lo,hi")
+        coef_report[name] = {}
+        for j, label in enumerate(labels[:len(point)]):
+            reps = [b[idx][j] for b in fits.boot if b[idx] is not None]
+            lo, hi = percentile(reps, lo_q), percentile(reps, hi_q)
+            coef_report[name][label] = {"point": finite(point[j]), "lo": finite(lo), "hi": finite(hi)}
+            print(f"{label},{point[j]:.4g},{lo:.4g},{hi:.4g}")
+        print("")
+
+    print("Requirement (min tier_mbps; 'hi' is the conservative bound):")
+    print("lat_ms,min_mbps,lo,hi,p_feasible,effective_mbps_needed,extrapolated")
+    req_report = []
+    for lat in lat_vals:
+        point = requirement(fits.stage, fits.tg, lat, chunk_mb, residency, args.stage_slo_s, args.tg_slo_tps)
+        reps = [requirement(s, t, lat, chunk_mb, residency, args.stage_slo_s, args.tg_slo_tps) for s, t in fits.boot]
+        reps = [v for v in reps if not math.isnan(v)]
+        p_feas = sum(1 for v in reps if not math.isinf(v)) / len(reps) if reps else math.nan
+        lo, hi = percentile(reps, lo_q), percentile(reps, hi_q)
+        eff = size_mb / args.stage_slo_s if size_mb and args.stage_slo_s else None
+        extrap = math.isfinite(point) and point > 0 and not (measured_mbps[0] <= point <= measured_mbps[-1])
+        req_report.append({"lat_ms": lat,
+                           "min_mbps": finite(point), "status": status(point),
+                           "lo": finite(lo), "lo_status": status(lo),
+                           "hi": finite(hi), "hi_status": status(hi),
+                           "p_feasible": finite(p_feas), "effective_mbps_needed": finite(eff),
+                           "extrapolated": extrap})
+        print(f"{lat:g},{fmt(point)},{fmt(lo)},{fmt(hi)},{p_feas:.2f},{'' if eff is None else f'{eff:.0f}'},{extrap}")
+    print("")
+
+    cand_mbps = ([float(x) for x in args.cand_mbps_list.split(",") if x.strip()] if args.cand_mbps_list
+                 else densify(measured_mbps, geometric=True))
+    cand_lat = ([float(x) for x in args.cand_lat_ms_list.split(",") if x.strip()] if args.cand_lat_ms_list
+                else densify([r["lat_ms"] for r in rows], geometric=False))
+    measured = {(r["mbps"], r["lat_ms"]) for r in rows}
+    scored = []
+    for mbps in cand_mbps:
+        if mbps <= 0:
+            continue
+        for lat in cand_lat:
+            if (mbps, lat) in measured:
+                continue
+            votes = [meets(s, t, mbps, lat, chunk_mb, residency, args.stage_slo_s, args.tg_slo_tps) for s, t in fits.boot]
+            votes = [v for v in votes if v is not None]
+            if not votes:
+                continue
+            p = sum(votes) / len(votes)
+            scored.append({"mbps": mbps, "lat_ms": lat, "p_meets": p, "score": p * (1.0 - p)})
+    scored.sort(key=lambda d: (-d["score"], d["mbps"], d["lat_ms"]))
+    next_points = scored[:args.suggest]
+
+    print("Next grid points (most SLO-uncertain first):")
+    print("mbps,lat_ms,p_meets_slo,score")
+    for d in next_points:
+        print(f"{d['mbps']:g},{d['lat_ms']:g},{d['p_meets']:.2f},{d['score']:.3f}")
+
+    if args.json_out:
+        out = Path(args.json_out).expanduser()
+        out.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "schema": "hbf-ready-bench.tier-requirements.v1",
+            "inputs": [str(p) for p in paths],
+            "codec": args.codec,
+            "codec_level": levels[0] or None,
+            "rows": len(rows),
+            "stage_events": len(fits.stage_rows),
+            "tg_rows": len(fits.tg_rows),
+            "residency_used": use_residency,
+            "dropped_unsettled": dropped,
+            "slo": {"stage_seconds": args.stage_slo_s, "tg_tps": args.tg_slo_tps},
+            "chunk_mb": chunk_mb,
+            "residency": residency,
+            "bootstrap": args.bootstrap,
+            "ci": args.ci,
+            "coefficients": coef_report,
+            "requirements": req_report,
+            "next_points": next_points,
+        }
+        out.write_text(json.dumps(report, indent=2, allow_nan=False), encoding="utf-8")
+        print(f"\nWrote: {out}")
+
+if __name__ == "__main__":
+    main()
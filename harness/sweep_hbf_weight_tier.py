@@ -23,6 +23,9 @@ Example:
   --mode hbf-emu \
   --out_dir results/hbf_weight_tier \
   --csv_out results/hbf_weight_tier.csv
+
+Compressed tier (model pre-compressed per chunk, compressed bytes throttled, pool decompression):
+./harness/sweep_hbf_weight_tier.py ... --codec zstd --decompress_workers 4
 """
 import argparse
 import csv
@@ -32,6 +35,8 @@ import time
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple
 
+from system_info import add_quiescence_args, fingerprint, quiesce_from_args
+
 def run_capture(cmd: List[str]) -> str:
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
     if p.returncode != 0:
@@ -89,6 +94,9 @@ def main():
     ap.add_argument("--mbps_list", default="250,500,1000,2000,4000")
     ap.add_argument("--lat_ms_list", default="0,0.05,0.2")
     ap.add_argument("--chunk_mb", type=float, default=4.0)
+    ap.add_argument("--codec", default="none", help="tier_copy.py --codec (none, zlib, lzma, lz4, zstd).")
+    ap.add_argument("--level", type=int, default=None, help="tier_copy.py --level for the codec.")
+    ap.add_argument("--decompress_workers", type=int, default=None, help="tier_copy.py --workers.")
     ap.add_argument("-t", "--threads", type=int, default=8)
     ap.add_argument("-p", "--prompt_tokens", type=int, default=256)
     ap.add_argument("-n", "--gen_tokens", type=int, default=256)
@@ -97,6 +105,7 @@ def main():
     ap.add_argument("--out_dir", default="results/hbf_weight_tier")
     ap.add_argument("--csv_out", default="results/hbf_weight_tier.csv")
     ap.add_argument("--repeats", type=int, default=1)
+    add_quiescence_args(ap)
     args = ap.parse_args()
 
     tier_copy = Path(args.tier_copy).expanduser()
@@ -122,8 +131,8 @@ def main():
 
     fieldnames = [
         "timestamp_unix","mode","tag","model","threads","p","n","repeat",
-        "tier_mbps","tier_lat_ms","tier_chunk_mb","stage_seconds","stage_effective_mbps",
-        "pp_tps","tg_tps","json_path"
+        "tier_mbps","tier_lat_ms","tier_chunk_mb","tier_codec","tier_codec_level","stage_seconds","stage_effective_mbps",
+        "stage_compression_ratio","stage_decompress_cpu_s","stage_total_cpu_s","pp_tps","tg_tps","host_settled","json_path"
     ]
 
     with csv_out.open("w", newline="", encoding="utf-8") as fcsv:
@@ -132,9 +141,10 @@ def main():
 
         for mbps in mbps_vals:
             for lat_ms in lat_vals:
-                staged_path = staged_dir / f"{model.name}.staged_mbps{mbps:g}_lat{lat_ms:g}_chunk{args.chunk_mb:g}.gguf"
+                codec_tag = "" if args.codec == "none" else f"_{args.codec}" + ("" if args.level is None else f"{args.level}")
+                staged_path = staged_dir / f"{model.name}.staged_mbps{mbps:g}_lat{lat_ms:g}_chunk{args.chunk_mb:g}{codec_tag}.gguf"
 
-                print(f"\n=== STAGE mbps={mbps:g} lat_ms={lat_ms:g} chunk_mb={args.chunk_mb:g} ===")
+                print(f"\n=== STAGE mbps={mbps:g} lat_ms={lat_ms:g} chunk_mb={args.chunk_mb:g} codec={args.codec} ===")
                 stage_cmd = [
                     "python3", str(tier_copy),
                     "--src", str(model),
@@ -142,7 +152,14 @@ def main():
                     "--mbps", str(mbps),
                     "--chunk_mb", str(args.chunk_mb),
                     "--lat_ms", str(lat_ms),
+                    "--codec", args.codec,
                 ]
+                if args.level is not None:
+                    stage_cmd += ["--level", str(args.level)]
+                if args.decompress_workers is not None:
+                    stage_cmd += ["--workers", str(args.decompress_workers)]
+                stage_quiescence = quiesce_from_args(args)
+                stage_host = fingerprint()
                 t0 = time.time()
                 stage_out = run_capture(stage_cmd)
                 stage_wall = time.time() - t0
@@ -151,6 +168,11 @@ def main():
 
                 for r_i in range(1, args.repeats + 1):
                     print(f"--- BENCH repeat {r_i}/{args.repeats} ---")
+                    # staging leaves GBs of dirty page cache behind; let writeback drain first
+                    bench_quiescence = quiesce_from_args(args)
+                    bench_host = fingerprint()
+                    gates = [q for q in (stage_quiescence, bench_quiescence) if q is not None]
+                    host_settled = all(q["settled"] for q in gates) if gates else None
                     bench_cmd = [
                         str(llama_bench),
                         "-m", str(staged_path),
@@ -175,13 +197,16 @@ def main():
                         "threads": args.threads,
                         "prompt_tokens": args.prompt_tokens,
                         "gen_tokens": args.gen_tokens,
-                        "tier": {"mbps": mbps, "lat_ms": lat_ms, "chunk_mb": args.chunk_mb},
-                        "stage": {"cmd": stage_cmd, "wall_seconds": stage_wall, "parsed": stage_parsed, "stdout": stage_out},
-                        "bench": {"cmd": bench_cmd, "wall_seconds": bench_wall, "rows": rows, "pp_tps": pp_tps, "tg_tps": tg_tps},
+                        "tier": {"mbps": mbps, "lat_ms": lat_ms, "chunk_mb": args.chunk_mb, "codec": args.codec, "codec_level": args.level},
+                        "stage": {"cmd": stage_cmd, "wall_seconds": stage_wall, "parsed": stage_parsed, "stdout": stage_out,
+                                  "quiescence": stage_quiescence, "fingerprint": stage_host},
+                        "bench": {"cmd": bench_cmd, "wall_seconds": bench_wall, "rows": rows, "pp_tps": pp_tps, "tg_tps": tg_tps,
+                                  "quiescence": bench_quiescence, "fingerprint": bench_host},
+                        "host_settled": host_settled,
                         "output_tail": "\n".join((stage_out + "\n" + bench_out).strip().splitlines()[-120:]),
                     }
 
-                    json_path = out_dir / f"weight_tier_mbps{mbps:g}_lat{lat_ms:g}_p{args.prompt_tokens}_n{args.gen_tokens}_r{r_i}.json"
+                    json_path = out_dir / f"weight_tier_mbps{mbps:g}_lat{lat_ms:g}{codec_tag}_p{args.prompt_tokens}_n{args.gen_tokens}_r{r_i}.json"
                     json_path.write_text(json.dumps(artifact, indent=2), encoding="utf-8")
 
                     w.writerow({
@@ -196,10 +221,16 @@ def main():
                         "tier_mbps": mbps,
                         "tier_lat_ms": lat_ms,
                         "tier_chunk_mb": args.chunk_mb,
+                        "tier_codec": args.codec,
+                        "tier_codec_level": args.level,
                         "stage_seconds": stage_parsed.get("duration_s", stage_wall),
                         "stage_effective_mbps": stage_eff,
+                        "stage_compression_ratio": stage_parsed.get("compression_ratio"),
+                        "stage_decompress_cpu_s": stage_parsed.get("decompress_cpu_s"),
+                        "stage_total_cpu_s": stage_parsed.get("total_cpu_s"),
                         "pp_tps": pp_tps,
                         "tg_tps": tg_tps,
+                        "host_settled": host_settled,
                         "json_path": str(json_path),
                     })
 
@@ -8,6 +8,8 @@ import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from system_info import add_quiescence_args, fingerprint, quiesce_from_args
+
 TPS_RE = re.compile(r"^\s*([0-9]+(?:\.[0-9]+)?)\s*(?:±\s*([0-9]+(?:\.[0-9]+)?))?\s*$")
 
 def run(cmd: List[str]) -> str:
@@ -65,6 +67,7 @@ def main():
     ap.add_argument("--p_list", default="64,128,256", help="Comma-separated prompt token sizes")
     ap.add_argument("--n_list", default="64,128,256", help="Comma-separated gen token sizes")
     ap.add_argument("--repeats", type=int, default=1, help="Repeat each grid point and report all rows in CSV")
+    add_quiescence_args(ap)
     args = ap.parse_args()
 
     bench = Path(args.llama_bench).expanduser()
@@ -86,7 +89,7 @@ def main():
     fieldnames = [
         "timestamp_unix","mode","tag","model_path","threads","p","n","repeat",
         "pp_tps","pp_mean","pp_std","tg_tps","tg_mean","tg_std",
-        "json_path"
+        "host_settled","json_path"
     ]
 
     with csv_out.open("w", newline="", encoding="utf-8") as fcsv:
@@ -104,6 +107,9 @@ def main():
                         "-n", str(n),
                     ]
                     print(f"\n=== sweep p={p} n={n} repeat={r_i}/{args.repeats} ===")
+                    quiescence = quiesce_from_args(args)
+                    host_settled = None if quiescence is None else quiescence["settled"]
+                    host = fingerprint()
                     start = time.time()
                     out = run(cmd)
                     wall_ms = (time.time() - start) * 1000.0
@@ -127,6 +133,9 @@ def main():
                         "pp_tps": pp_tps,
                         "tg_tps": tg_tps,
                         "rows": rows,
+                        "host_settled": host_settled,
+                        "quiescence": quiescence,
+                        "fingerprint": host,
                         "output_tail": "\n".join(out.strip().splitlines()[-80:]),
                     }
 
@@ -148,6 +157,7 @@ def main():
                         "tg_tps": tg_tps,
                         "tg_mean": tg_mean,
                         "tg_std": tg_std,
+                        "host_settled": host_settled,
                         "json_path": str(json_path),
                     })
 
@@ -1,12 +1,209 @@
 #!/usr/bin/env python3
+"""
+system_info.py
+
+- main(): one-off machine context (lscpu/free/df text + structured fingerprint) -> results/system_info.json
+- fingerprint(): fast structured host state read directly from /proc and /sys (no subprocesses),
+  cheap enough to embed in every run artifact.
+- wait_for_quiescence(): pre-flight gate that waits (with a timeout) until CPU load, core frequency
+  and dirty page-cache writeback settle; reports whether the host settled so unsettled points can be flagged.
+
+The harness scripts import these directly (`from system_info import ...`; harness/ is on sys.path when they run).
+"""
+import argparse
+import glob
 import json
+import os
 import platform
 import subprocess
+import time
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 def sh(cmd: str) -> str:
     return subprocess.check_output(cmd, shell=True, text=True).strip()
 
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def read_int(path: str) -> Optional[int]:
+    v = read_text(path)
+    try:
+        return int(v) if v is not None else None
+    except ValueError:
+        return None
+
+def meminfo() -> Dict[str, int]:
+    """/proc/meminfo in bytes."""
+    out: Dict[str, int] = {}
+    for ln in (read_text("/proc/meminfo") or "").splitlines():
+        k, _, rest = ln.partition(":")
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            out[k] = int(parts[0]) * (1024 if len(parts) > 1 and parts[1] == "kB" else 1)
+    return out
+
+def cpu_times() -> Tuple[int, int]:
+    """(busy, total) jiffies from the aggregate cpu line of /proc/stat."""
+    ln = (read_text("/proc/stat") or "").split("\n", 1)[0].split()
+    if not ln or ln[0] != "cpu":
+        return 0, 0
+    vals = [int(x) for x in ln[1:]]
+    idle = vals[3] + (vals[4] if len(vals) > 4 else 0)  # idle + iowait
+    total = sum(vals[:8])  # guest time is already counted in user/nice
+    return total - idle, total
+
+def cpu_freqs() -> List[Dict[str, Any]]:
+    """Per-core cpufreq state; falls back to /proc/cpuinfo MHz where cpufreq is not exposed (e.g. WSL)."""
+    cores = []
+    for d in sorted(glob.glob("/sys/devices/system/cpu/cpu[0-9]*"), key=lambda p: int(p.rsplit("cpu", 1)[1])):
+        fq = d + "/cpufreq"
+        if not os.path.isdir(fq):
+            continue
+        cores.append({
+            "cpu": int(d.rsplit("cpu", 1)[1]),
+            "governor": read_text(fq + "/scaling_governor"),
+            "cur_khz": read_int(fq + "/scaling_cur_freq"),
+            "max_khz": read_int(fq + "/scaling_max_freq"),
+            "hw_max_khz": read_int(fq + "/cpuinfo_max_freq"),
+        })
+    if cores:
+        return cores
+    cpu = -1
+    for ln in (read_text("/proc/cpuinfo") or "").splitlines():
+        k, _, v = ln.partition(":")
+        k = k.strip()
+        if k == "processor":
+            cpu = int(v)
+        elif k == "cpu MHz":
+            cores.append({"cpu": cpu, "governor": None, "cur_khz": int(float(v) * 1000),
+                          "max_khz": None, "hw_max_khz": None})
+    return cores
+
+def mean_cur_khz(cores: List[Dict[str, Any]]) -> Optional[float]:
+    vals = [c["cur_khz"] for c in cores if c.get("cur_khz")]
+    return sum(vals) / len(vals) if vals else None
+
+def boost_state() -> Optional[bool]:
+    v = read_int("/sys/devices/system/cpu/cpufreq/boost")
+    if v is not None:
+        return bool(v)
+    v = read_int("/sys/devices/system/cpu/intel_pstate/no_turbo")
+    return None if v is None else not v
+
+def thermal_zones() -> List[Dict[str, Any]]:
+    zones = []
+    for d in sorted(glob.glob("/sys/class/thermal/thermal_zone*")):
+        t = read_int(d + "/temp")
+        zones.append({"zone": os.path.basename(d), "type": read_text(d + "/type"),
+                      "temp_c": None if t is None else t / 1000.0})
+    return zones
+
+def fingerprint() -> Dict[str, Any]:
+    """Structured host state from /proc and /sys only; safe to call before every grid point."""
+    mi = meminfo()
+    load = (read_text("/proc/loadavg") or "").split()
+    osrelease = read_text("/proc/sys/kernel/osrelease") or platform.release()
+    cores = cpu_freqs()
+    return {
+        "timestamp_unix": time.time(),
+        "kernel": osrelease,
+        "is_wsl": "microsoft" in osrelease.lower(),
+        "ncpu": os.cpu_count(),
+        "loadavg": [float(x) for x in load[:3]] if len(load) >= 3 else None,
+        "cpu": {
+            "governors": sorted({c["governor"] for c in cores if c["governor"]}),
+            "boost": boost_state(),
+            "mean_cur_khz": mean_cur_khz(cores),
+            "cores": cores,
+        },
+        "thermal": thermal_zones(),
+        "memory": {
+            "total_bytes": mi.get("MemTotal"),
+            "available_bytes": mi.get("MemAvailable"),
+            "cached_bytes": mi.get("Cached"),
+            "dirty_bytes": mi.get("Dirty"),
+            "writeback_bytes": mi.get("Writeback"),
+            "swap_total_bytes": mi.get("SwapTotal"),
+            "swap_free_bytes": mi.get("SwapFree"),
+        },
+    }
+
+def wait_for_quiescence(timeout_s: float = 60.0, interval_s: float = 1.0, max_busy: float = 0.10,
+                        max_dirty_mb: float = 64.0, freq_tol: float = 0.05,
+                        settle_samples: int = 3) -> Dict[str, Any]:
+    """
+    Sample the host every interval_s until `settle_samples` consecutive samples pass:
+    - CPU busy fraction (from /proc/stat over the interval) <= max_busy
+    - Dirty + Writeback page cache <= max_dirty_mb
+    - mean core frequency changed by <= freq_tol (relative) since the previous sample
+    Gives up after timeout_s and returns settled=False with the failing reasons.
+    """
+    start = time.time()
+    ok_run = 0
+    samples = 0
+    reasons: List[str] = []
+    last: Dict[str, Any] = {}
+    busy0, total0 = cpu_times()
+    prev_khz = mean_cur_khz(cpu_freqs())
+
+    while True:
+        time.sleep(interval_s)
+        busy1, total1 = cpu_times()
+        busy = (busy1 - busy0) / (total1 - total0) if total1 > total0 else 0.0
+        busy0, total0 = busy1, total1
+        mi = meminfo()
+        dirty_mb = (mi.get("Dirty", 0) + mi.get("Writeback", 0)) / 1e6
+        khz = mean_cur_khz(cpu_freqs())
+        drift = abs(khz - prev_khz) / prev_khz if khz and prev_khz else 0.0
+        prev_khz = khz
+        samples += 1
+
+        reasons = []
+        if busy > max_busy:
+            reasons.append(f"cpu_busy={busy:.2f}>{max_busy:g}")
+        if dirty_mb > max_dirty_mb:
+            reasons.append(f"dirty_mb={dirty_mb:.1f}>{max_dirty_mb:g}")
+        if drift > freq_tol:
+            reasons.append(f"freq_drift={drift:.3f}>{freq_tol:g}")
+        last = {"cpu_busy": busy, "dirty_mb": dirty_mb, "mean_cur_khz": khz, "freq_drift": drift}
+
+        ok_run = 0 if reasons else ok_run + 1
+        waited = time.time() - start
+        if ok_run >= settle_samples or waited >= timeout_s:
+            if ok_run < settle_samples and not reasons:
+                reasons = [f"settled_samples={ok_run}<{settle_samples}"]
+            return {
+                "settled": ok_run >= settle_samples,
+                "waited_s": round(waited, 3),
+                "samples": samples,
+                "last": last,
+                "reasons": reasons,
+                "limits": {"timeout_s": timeout_s, "max_busy": max_busy, "max_dirty_mb": max_dirty_mb,
+                           "freq_tol": freq_tol, "settle_samples": settle_samples},
+            }
+
+def add_quiescence_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--quiesce_timeout_s", type=float, default=60.0,
+                    help="Max seconds to wait for the host to settle before each point (0 = no gate).")
+    ap.add_argument("--quiesce_max_busy", type=float, default=0.10, help="Max CPU busy fraction to count as settled.")
+    ap.add_argument("--quiesce_max_dirty_mb", type=float, default=64.0, help="Max Dirty+Writeback MB.")
+    ap.add_argument("--quiesce_freq_tol", type=float, default=0.05, help="Max relative mean-frequency drift.")
+
+def quiesce_from_args(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """Run the gate configured by add_quiescence_args; None when disabled."""
+    if args.quiesce_timeout_s <= 0:
+        return None
+    q = wait_for_quiescence(timeout_s=args.quiesce_timeout_s, max_busy=args.quiesce_max_busy,
+                            max_dirty_mb=args.quiesce_max_dirty_mb, freq_tol=args.quiesce_freq_tol)
+    if not q["settled"]:
+        print(f"WARNING: host not settled after {q['waited_s']:.0f}s ({', '.join(q['reasons'])}); point will be flagged")
+    return q
+
 def main():
     info = {
         "platform": {
@@ -24,6 +221,7 @@ def main():
             "kernel": sh("uname -r"),
             "is_wsl": "microsoft" in sh("uname -r").lower(),
         },
+        "fingerprint": fingerprint(),
     }
 
     out = Path("results/system_info.json")